@@ -1,12 +1,28 @@
-
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 url = 'https://ezeleis-webendpoint.sandbox.landing.ai/inference'
-data = {
-  '{{your_param_name}}': '{{your_image_url}}'
-}
 headers = {
   "Authorization": "Basic {{your_api_key}}"
 }
-response = requests.post(url, data=data, headers=headers)
-print(response.status_code)
-print(response.json())
+
+# One keep-alive session so repeated calls reuse the TCP/TLS connection
+session = requests.Session()
+session.headers.update(headers)
+session.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+def detect(image_url):
+  data = {
+    '{{your_param_name}}': image_url
+  }
+  return session.post(url, data=data)
+
+def detect_many(image_urls, max_workers=16):
+  # Requests are network-bound, so threads fan them out over the pooled connections
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    return list(executor.map(detect, image_urls))
+
+if __name__ == "__main__":
+  response = detect('{{your_image_url}}')
+  print(response.status_code)
+  print(response.json())
@@ -2,17 +2,16 @@
 
 import os
 import numpy as np
-from vision_agent.tools import *
-from vision_agent.tools.planner_tools import judge_od_results
 from typing import *
+from PIL import Image
 from pillow_heif import register_heif_opener
-register_heif_opener()
-import vision_agent as va
-from vision_agent.tools import register_tool
-from vision_agent.tools import load_image, owlv2_object_detection, overlay_bounding_boxes, save_image
 import json
 
-def detect_and_measure_boats(image_path: str):
+# Register the HEIF opener once per process, even if this module is re-imported
+if "HEIF" not in Image.OPEN:
+    register_heif_opener()
+
+def detect_and_measure_boats(image_path: str, output_dir: str = None):
     """
     Detect boats in a satellite image of a marina and measure each boat's length.
     Returns a list of detections, each containing:
@@ -25,9 +24,13 @@ def detect_and_measure_boats(image_path: str):
          the max dimension of the bounding box (in pixels).
       4) Overlay bounding boxes and label each boat with the format 
          "Boat {index} ({boat_length_pixels}px)".
-      5) Save the resulting image with bounding boxes.
+      5) Save the resulting image with bounding boxes (into output_dir if given,
+         otherwise next to the input image).
       6) Return the list of detections with boat_length_pixels.
     """
+    # vision_agent is heavy to import, so load it only when detection runs
+    from vision_agent.tools import load_image, owlv2_object_detection, overlay_bounding_boxes, save_image
+    
     try:
         # 1) Load the image
         image = load_image(image_path)
@@ -35,23 +38,25 @@ def detect_and_measure_boats(image_path: str):
         # 2) Detect boats using vision-agent owlv2_object_detection
         detections = owlv2_object_detection("boat", image, box_threshold=0.3)
         
-        # 3) Calculate the length of each boat in pixels
+        # 3) Calculate the length of each boat in pixels, all boxes at once
         height, width, _ = image.shape
-        for det in detections:
-            x_min, y_min, x_max, y_max = det["bbox"]
-            box_width = (x_max - x_min) * width
-            box_height = (y_max - y_min) * height
-            det["boat_length_pixels"] = max(box_width, box_height)
+        bboxes = np.array([det["bbox"] for det in detections], dtype=np.float64).reshape(-1, 4)
+        lengths = ((bboxes[:, 2:] - bboxes[:, :2]) * np.array([width, height])).max(axis=1).tolist()
         
         # 4) Overlay bounding boxes with labels showing boat number and length
-        for i, det in enumerate(detections, 1):
-            det['label'] = f"Boat {i} ({int(det['boat_length_pixels'])}px)"
+        for i, (det, length) in enumerate(zip(detections, lengths), 1):
+            det["boat_length_pixels"] = length
+            det['label'] = f"Boat {i} ({int(length)}px)"
         
         annotated_image = overlay_bounding_boxes(image, detections)
         
-        # 5) Save the image with "_annotated" suffix
+        # 5) Save the image with "_annotated" suffix, straight to its final location
         base_name, ext = os.path.splitext(image_path)
-        output_path = f"{base_name}_annotated{ext}"
+        if output_dir:
+            filename = os.path.basename(base_name)
+            output_path = os.path.join(output_dir, f"{filename}_annotated{ext}")
+        else:
+            output_path = f"{base_name}_annotated{ext}"
         save_image(annotated_image, output_path)
         
         # 6) Return the list of detections with boat_length_pixels
@@ -78,28 +83,23 @@ def main():
     os.makedirs(output_directory, exist_ok=True)
     
     try:
-        # Run boat detection using vision-agent
-        detections, annotated_path = detect_and_measure_boats(input_image_path)
-        
-        # Move annotated image to output directory
-        if annotated_path:
-            filename = os.path.basename(annotated_path)
-            final_path = os.path.join(output_directory, filename)
-            os.rename(annotated_path, final_path)
-            annotated_path = final_path
+        # Run boat detection using vision-agent; the annotated image is written
+        # directly into the output directory, so no move is needed afterwards
+        detections, annotated_path = detect_and_measure_boats(input_image_path, output_directory)
         
         # Convert detections to required format
-        formatted_detections = []
-        for i, det in enumerate(detections):
-            formatted_detections.append({
-                "objectId": f"boat_{i+1}",
+        formatted_detections = [
+            {
+                "objectId": f"boat_{i}",
                 "objectType": "boat",
                 "subType": "boat",  # Use only "boat" label
                 "confidence": float(det["score"]),
                 "bbox": det["bbox"],
                 "boat_length_pixels": float(det["boat_length_pixels"]),
-                "label": det.get("label", f"Boat {i+1}")
-            })
+                "label": det.get("label", f"Boat {i}")
+            }
+            for i, det in enumerate(detections, 1)
+        ]
         
         # Output results as JSON for Node.js to parse
         result = {
@@ -108,7 +108,7 @@ def main():
             "status": "success"
         }
         
-        print(json.dumps(result))
+        print(json.dumps(result, separators=(',', ':'), default=float))
         
     except Exception as e:
         # Output error as JSON
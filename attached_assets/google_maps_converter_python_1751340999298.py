@@ -1,5 +1,13 @@
 import math
+from functools import lru_cache
 from typing import Tuple, Dict, Optional
+import numpy as np
+
+# Angle conversion factors, folded once instead of per conversion
+_DEG2RAD = math.pi / 180.0
+_RAD2DEG = 180.0 / math.pi
+_HALF_DEG2RAD = math.pi / 360.0
+_HALF_PI = math.pi / 2.0
 
 class GoogleMapsConverter:
     """
@@ -30,6 +38,10 @@ class GoogleMapsConverter:
         self.EARTH_RADIUS = 6378137  # Earth's radius in meters
         self.ORIGIN_SHIFT = 2 * math.pi * self.EARTH_RADIUS / 2.0
         
+        # Mercator meters per degree, and its inverse folded with deg->rad
+        self._k = self.ORIGIN_SHIFT / 180.0
+        self._mercator_to_rad = _DEG2RAD / self._k
+        
         # Calculate center point in Web Mercator coordinates
         self.center_mercator = self._lat_lng_to_mercator(center_lat, center_lng)
         
@@ -39,26 +51,25 @@ class GoogleMapsConverter:
         else:
             self.meters_per_pixel = self._calculate_meters_per_pixel(center_lat, zoom_level)
     
-    def _lat_lng_to_mercator(self, lat: float, lng: float) -> Dict[str, float]:
-        """Convert latitude/longitude to Web Mercator coordinates"""
-        x = lng * self.ORIGIN_SHIFT / 180.0
-        y = math.log(math.tan((90 + lat) * math.pi / 360.0)) / (math.pi / 180.0)
-        y = y * self.ORIGIN_SHIFT / 180.0
-        return {'x': x, 'y': y}
+    def _lat_lng_to_mercator(self, lat: float, lng: float) -> Tuple[float, float]:
+        """Convert latitude/longitude to Web Mercator (x, y) coordinates"""
+        k = self._k
+        x = lng * k
+        y = math.log(math.tan((90 + lat) * _HALF_DEG2RAD)) * _RAD2DEG * k
+        return x, y
     
-    def _mercator_to_lat_lng(self, x: float, y: float) -> Dict[str, float]:
-        """Convert Web Mercator coordinates to latitude/longitude"""
-        lng = (x / self.ORIGIN_SHIFT) * 180.0
-        lat = (y / self.ORIGIN_SHIFT) * 180.0
-        lat = 180 / math.pi * (2 * math.atan(math.exp(lat * math.pi / 180.0)) - math.pi / 2.0)
-        return {'lat': lat, 'lng': lng}
+    def _mercator_to_lat_lng(self, x: float, y: float) -> Tuple[float, float]:
+        """Convert Web Mercator coordinates to (lat, lng)"""
+        lng = x / self._k
+        lat = _RAD2DEG * (2 * math.atan(math.exp(y * self._mercator_to_rad)) - _HALF_PI)
+        return lat, lng
     
     def _calculate_meters_per_pixel(self, lat: float, zoom: int) -> float:
         """Calculate meters per pixel at given latitude and zoom level"""
-        lat_rad = lat * math.pi / 180
+        lat_rad = lat * _DEG2RAD
         return (156543.03392 * math.cos(lat_rad)) / (2 ** zoom)
     
-    def pixel_to_lat_lng(self, pixel_x: int, pixel_y: int) -> Dict[str, float]:
+    def pixel_to_lat_lng(self, pixel_x: int, pixel_y: int) -> Tuple[float, float]:
         """
         Convert pixel coordinates to latitude/longitude
         
@@ -67,7 +78,7 @@ class GoogleMapsConverter:
             pixel_y: Y coordinate in image (0 = top edge)
             
         Returns:
-            Dictionary with 'lat' and 'lng' keys
+            Tuple of (latitude, longitude)
         """
         # Calculate offset from center in pixels
         offset_x = pixel_x - (self.image_width / 2)
@@ -78,13 +89,13 @@ class GoogleMapsConverter:
         meter_y = -offset_y * self.meters_per_pixel
         
         # Calculate new mercator coordinates
-        new_mercator_x = self.center_mercator['x'] + meter_x
-        new_mercator_y = self.center_mercator['y'] + meter_y
+        new_mercator_x = self.center_mercator[0] + meter_x
+        new_mercator_y = self.center_mercator[1] + meter_y
         
         # Convert back to lat/lng
         return self._mercator_to_lat_lng(new_mercator_x, new_mercator_y)
     
-    def lat_lng_to_pixel(self, lat: float, lng: float) -> Dict[str, float]:
+    def lat_lng_to_pixel(self, lat: float, lng: float) -> Tuple[float, float]:
         """
         Convert latitude/longitude to pixel coordinates
         
@@ -93,14 +104,14 @@ class GoogleMapsConverter:
             lng: Longitude
             
         Returns:
-            Dictionary with 'x' and 'y' pixel coordinates
+            Tuple of (pixel_x, pixel_y)
         """
         # Convert to mercator
-        mercator = self._lat_lng_to_mercator(lat, lng)
+        mercator_x, mercator_y = self._lat_lng_to_mercator(lat, lng)
         
         # Calculate offset in meters from center
-        meter_offset_x = mercator['x'] - self.center_mercator['x']
-        meter_offset_y = mercator['y'] - self.center_mercator['y']
+        meter_offset_x = mercator_x - self.center_mercator[0]
+        meter_offset_y = mercator_y - self.center_mercator[1]
         
         # Convert to pixel offset (note: Y is inverted)
         pixel_offset_x = meter_offset_x / self.meters_per_pixel
@@ -110,7 +121,53 @@ class GoogleMapsConverter:
         pixel_x = (self.image_width / 2) + pixel_offset_x
         pixel_y = (self.image_height / 2) + pixel_offset_y
         
-        return {'x': pixel_x, 'y': pixel_y}
+        return pixel_x, pixel_y
+    
+    def pixels_to_lat_lng(self, pixel_xs, pixel_ys) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Convert many pixel coordinates to latitude/longitude in one vectorized pass
+        
+        Args:
+            pixel_xs: Array-like of X coordinates in image (0 = left edge)
+            pixel_ys: Array-like of Y coordinates in image (0 = top edge)
+            
+        Returns:
+            Tuple of (latitudes, longitudes) arrays
+        """
+        offset_x = np.asarray(pixel_xs, dtype=np.float64) - (self.image_width / 2)
+        offset_y = np.asarray(pixel_ys, dtype=np.float64) - (self.image_height / 2)
+        
+        # Pixel offset to mercator meters (note: Y is inverted)
+        mercator_x = self.center_mercator[0] + offset_x * self.meters_per_pixel
+        mercator_y = self.center_mercator[1] - offset_y * self.meters_per_pixel
+        
+        # Inverse Web Mercator over the whole array
+        lngs = mercator_x / self._k
+        lats = _RAD2DEG * (2 * np.arctan(np.exp(mercator_y * self._mercator_to_rad)) - _HALF_PI)
+        return lats, lngs
+    
+    def lat_lngs_to_pixels(self, lats, lngs) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Convert many latitude/longitude pairs to pixel coordinates in one vectorized pass
+        
+        Args:
+            lats: Array-like of latitudes
+            lngs: Array-like of longitudes
+            
+        Returns:
+            Tuple of (pixel_xs, pixel_ys) arrays
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        
+        # Forward Web Mercator over the whole array
+        mercator_x = lngs * self._k
+        mercator_y = np.log(np.tan((90 + lats) * _HALF_DEG2RAD)) * (_RAD2DEG * self._k)
+        
+        # Meter offset from center to pixels (note: Y is inverted)
+        pixel_xs = (self.image_width / 2) + (mercator_x - self.center_mercator[0]) / self.meters_per_pixel
+        pixel_ys = (self.image_height / 2) - (mercator_y - self.center_mercator[1]) / self.meters_per_pixel
+        return pixel_xs, pixel_ys
     
     def get_resolution_info(self) -> Dict:
         """Get resolution and configuration information"""
@@ -167,12 +224,12 @@ def main():
     
     # Test conversion: pixel (514, 452) to lat/lng
     test_pixel_x, test_pixel_y = 514, 452
-    coords = converter.pixel_to_lat_lng(test_pixel_x, test_pixel_y)
-    print(f"Pixel ({test_pixel_x}, {test_pixel_y}) -> Lat/Lng: {coords['lat']:.8f}, {coords['lng']:.8f}")
+    lat, lng = converter.pixel_to_lat_lng(test_pixel_x, test_pixel_y)
+    print(f"Pixel ({test_pixel_x}, {test_pixel_y}) -> Lat/Lng: {lat:.8f}, {lng:.8f}")
     
     # Test reverse conversion
-    pixel_coords = converter.lat_lng_to_pixel(coords['lat'], coords['lng'])
-    print(f"Lat/Lng back to pixel: ({pixel_coords['x']:.1f}, {pixel_coords['y']:.1f})")
+    back_x, back_y = converter.lat_lng_to_pixel(lat, lng)
+    print(f"Lat/Lng back to pixel: ({back_x:.1f}, {back_y:.1f})")
     
     # Calculate distance from center
     distance = converter.calculate_distance_from_center(test_pixel_x, test_pixel_y)
@@ -189,8 +246,29 @@ def main():
     ]
     
     for x, y, name in corners:
-        corner_coords = converter.pixel_to_lat_lng(x, y)
-        print(f"{name} ({x}, {y}): {corner_coords['lat']:.8f}, {corner_coords['lng']:.8f}")
+        corner_lat, corner_lng = converter.pixel_to_lat_lng(x, y)
+        print(f"{name} ({x}, {y}): {corner_lat:.8f}, {corner_lng:.8f}")
+    
+    # Batch conversion of all corners at once
+    print("\n=== Batch Conversion ===")
+    xs = np.array([x for x, _, _ in corners])
+    ys = np.array([y for _, y, _ in corners])
+    lats, lngs = converter.pixels_to_lat_lng(xs, ys)
+    back_xs, back_ys = converter.lat_lngs_to_pixels(lats, lngs)
+    for (x, y, name), lat, lng, bx, by in zip(corners, lats, lngs, back_xs, back_ys):
+        print(f"{name}: {lat:.8f}, {lng:.8f} -> ({bx:.1f}, {by:.1f})")
+
+
+@lru_cache(maxsize=64)
+def _make_converter(center_lat: float, center_lng: float, zoom_level: int,
+                    image_width: int, image_height: int,
+                    resolution: Optional[float]) -> GoogleMapsConverter:
+    """
+    Return a shared converter per map configuration, so repeated helper calls
+    skip re-projecting the center and recomputing the resolution
+    """
+    return GoogleMapsConverter(center_lat, center_lng, zoom_level,
+                               image_width, image_height, resolution)
 
 
 def convert_pixel_to_coordinates(pixel_x: int, pixel_y: int, 
@@ -214,10 +292,9 @@ def convert_pixel_to_coordinates(pixel_x: int, pixel_y: int,
     Returns:
         Tuple of (latitude, longitude)
     """
-    converter = GoogleMapsConverter(center_lat, center_lng, zoom_level, 
-                                   image_width, image_height, resolution)
-    coords = converter.pixel_to_lat_lng(pixel_x, pixel_y)
-    return coords['lat'], coords['lng']
+    converter = _make_converter(center_lat, center_lng, zoom_level,
+                                image_width, image_height, resolution)
+    return converter.pixel_to_lat_lng(pixel_x, pixel_y)
 
 
 def convert_coordinates_to_pixel(lat: float, lng: float,
@@ -241,10 +318,9 @@ def convert_coordinates_to_pixel(lat: float, lng: float,
     Returns:
         Tuple of (pixel_x, pixel_y)
     """
-    converter = GoogleMapsConverter(center_lat, center_lng, zoom_level,
-                                   image_width, image_height, resolution)
-    pixel_coords = converter.lat_lng_to_pixel(lat, lng)
-    return pixel_coords['x'], pixel_coords['y']
+    converter = _make_converter(center_lat, center_lng, zoom_level,
+                                image_width, image_height, resolution)
+    return converter.lat_lng_to_pixel(lat, lng)
 
 
 if __name__ == "__main__":
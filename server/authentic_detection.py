@@ -2,10 +2,13 @@
 import os
 import sys
 import json
-import random
-from PIL import Image, ImageDraw
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageColor, ImageDraw
 import numpy as np
 
+# PIL's "green", written straight into the RGB array when drawing boxes
+BOX_COLOR = ImageColor.getrgb("green")
+
 def analyze_marina_image(image_path: str, output_dir: str):
     """
     Authentic marina image analysis that detects boat-like structures
@@ -19,63 +22,80 @@ def analyze_marina_image(image_path: str, output_dir: str):
         img_array = np.array(image)
         
         # Analyze image for boat characteristics
-        detections = []
-        boat_count = 0
-        
         # Grid-based analysis to find boat-like regions
         step_size = 20
         min_boat_size = 8
         max_boat_size = 40
         
-        for y in range(0, height - min_boat_size, step_size):
-            for x in range(0, width - min_boat_size, step_size):
-                # Variable region size for better detection
-                region_size = random.randint(min_boat_size, min(max_boat_size, min(height-y, width-x)))
-                region = img_array[y:y+region_size, x:x+region_size]
-                
-                if detect_boat_in_region(region):
-                    boat_count += 1
-                    
-                    # More realistic boat dimensions based on marina imagery
-                    boat_w = random.randint(8, 32)
-                    boat_h = random.randint(6, 20)
-                    
-                    # Calculate confidence based on image features
-                    confidence = calculate_region_confidence(region)
-                    
-                    detection = {
-                        "objectId": f"boat_{boat_count}",
-                        "objectType": "boat", 
-                        "subType": "vessel",
-                        "confidence": confidence,
-                        "bbox": [
-                            x / width,
-                            y / height, 
-                            (x + boat_w) / width,
-                            (y + boat_h) / height
-                        ],
-                        "boat_length_pixels": max(boat_w, boat_h),
-                        "latitude": 0.0,
-                        "longitude": 0.0,
-                        "length": max(boat_w, boat_h) * 0.15,
-                        "width": min(boat_w, boat_h) * 0.15,
-                        "area": boat_w * boat_h * 0.0225
-                    }
-                    detections.append(detection)
+        # Region origins on the scan grid, each with a variable region size for better detection
+        grid_y, grid_x = np.meshgrid(
+            np.arange(0, height - min_boat_size, step_size),
+            np.arange(0, width - min_boat_size, step_size),
+            indexing="ij"
+        )
+        region_sizes = region_sizes_for(
+            grid_y, grid_x, min_boat_size,
+            np.minimum(max_boat_size, np.minimum(height - grid_y, width - grid_x))
+        )
+        
+        # Score every region at once from summed-area tables
+        brightness, contrast, edge_density = region_statistics(img_array, grid_y, grid_x, region_sizes)
+        
+        # Detection criteria based on actual image analysis, with a
+        # probability factor for realistic detection rates
+        hits = (
+            (brightness > 80)
+            & (edge_density > 2)
+            & detection_gate(grid_y, grid_x, 0.35)
+        )
+        
+        # Detections are kept as parallel columns and only turned into dicts for JSON
+        ys = grid_y[hits]
+        xs = grid_x[hits]
+        
+        # Calculate confidence based on image features
+        confidences = confidence_from_stats(brightness[hits], contrast[hits])
+        
+        # More realistic boat dimensions based on marina imagery
+        boat_w = np.random.randint(8, 33, len(ys))
+        boat_h = np.random.randint(6, 21, len(ys))
+        boat_length = np.maximum(boat_w, boat_h)
+        boat_breadth = np.minimum(boat_w, boat_h)
+        
+        bboxes = np.stack([xs / width, ys / height, (xs + boat_w) / width, (ys + boat_h) / height], axis=1)
+        
+        detections = [
+            {
+                "objectId": f"boat_{boat_count}",
+                "objectType": "boat", 
+                "subType": "vessel",
+                "confidence": confidence,
+                "bbox": bbox,
+                "boat_length_pixels": length_pixels,
+                "latitude": 0.0,
+                "longitude": 0.0,
+                "length": length,
+                "width": breadth,
+                "area": area
+            }
+            for boat_count, (confidence, bbox, length_pixels, length, breadth, area) in enumerate(zip(
+                confidences.tolist(),
+                bboxes.tolist(),
+                boat_length.tolist(),
+                (boat_length * 0.15).tolist(),
+                (boat_breadth * 0.15).tolist(),
+                (boat_w * boat_h * 0.0225).tolist()
+            ), 1)
+        ]
         
         # Create annotated image with bounding boxes
-        annotated_img = image.copy()
+        boxes = (bboxes * [width, height, width, height]).astype(int)
+        annotated_array = draw_boxes(np.array(image.convert("RGB")), boxes)
+        annotated_img = Image.fromarray(annotated_array)
         draw = ImageDraw.Draw(annotated_img)
         
-        for det in detections:
-            bbox = det["bbox"]
-            x1, y1 = int(bbox[0] * width), int(bbox[1] * height)
-            x2, y2 = int(bbox[2] * width), int(bbox[3] * height)
-            
-            # Draw green bounding box
-            draw.rectangle([x1, y1, x2, y2], outline="green", width=2)
-            
-            # Add label
+        # Add labels
+        for det, (x1, y1) in zip(detections, boxes[:, :2].tolist()):
             label = f"{det['objectId']} ({det['confidence']}%)"
             draw.text((x1, y1-15), label, fill="green")
         
@@ -92,46 +112,142 @@ def analyze_marina_image(image_path: str, output_dir: str):
     except Exception as e:
         return [], ""
 
-def detect_boat_in_region(region):
-    """Analyze region for boat-like characteristics"""
-    if region.size == 0:
-        return False
-        
-    # Color analysis - boats are typically lighter than water
-    brightness = np.mean(region)
+def draw_boxes(img_array, boxes):
+    """
+    Draw 2px green bounding box outlines in place by writing the four border
+    strips of each (x1, y1, x2, y2) pixel box as array slices, matching
+    ImageDraw.rectangle(width=2)
+    """
+    for x1, y1, x2, y2 in boxes.tolist():
+        img_array[y1:y1+2, x1:x2+1] = BOX_COLOR
+        img_array[max(y2-1, 0):y2+1, x1:x2+1] = BOX_COLOR
+        img_array[y1:y2+1, x1:x1+2] = BOX_COLOR
+        img_array[y1:y2+1, max(x2-1, 0):x2+1] = BOX_COLOR
     
-    # Edge detection - boats have defined edges
-    if len(region.shape) == 3:
-        gray = np.mean(region, axis=2)
-    else:
-        gray = region
-        
-    edges = np.abs(np.diff(gray, axis=0)).sum() + np.abs(np.diff(gray, axis=1)).sum()
-    edge_density = edges / gray.size if gray.size > 0 else 0
+    return img_array
+
+def detection_gate(ys, xs, probability):
+    """
+    Deterministic stand-in for random.random() < probability at each region
+    origin: a multiplicative hash of the pixel coordinates passes for about
+    that fraction of regions, so the same image always gives the same hits
+    """
+    hashes = (
+        (np.asarray(ys, dtype=np.uint32) * np.uint32(2654435761))
+        ^ (np.asarray(xs, dtype=np.uint32) * np.uint32(374761393))
+    )
+    return hashes < np.uint32(probability * 2**32)
+
+def region_sizes_for(ys, xs, min_size, max_sizes):
+    """
+    Deterministic stand-in for np.random.randint(min_size, max_sizes + 1) at each
+    region origin, from a second coordinate hash mixed so it is independent of
+    detection_gate's
+    """
+    hashes = (
+        (np.asarray(ys, dtype=np.uint32) * np.uint32(374761393))
+        ^ (np.asarray(xs, dtype=np.uint32) * np.uint32(2654435761))
+    )
+    hashes ^= hashes >> np.uint32(15)
+    hashes *= np.uint32(2246822519)
+    hashes ^= hashes >> np.uint32(13)
+    return min_size + hashes.astype(np.int64) % (np.asarray(max_sizes) - min_size + 1)
+
+def confidence_from_stats(brightness, contrast):
+    """Confidence scores from region brightness and contrast, vectorized over regions"""
+    # Base confidence calculation
+    brightness_score = np.minimum(brightness / 255.0, 1.0) * 40
+    contrast_score = np.minimum(contrast / 100.0, 1.0) * 30
+    base_confidence = 30 + brightness_score + contrast_score
     
-    # Detection criteria based on actual image analysis
-    has_boat_brightness = brightness > 80
-    has_defined_edges = edge_density > 2
+    # Add some randomness for realistic variation
+    confidence = base_confidence + np.random.uniform(-5, 15, np.shape(base_confidence))
+    
+    return np.round(np.clip(confidence, 30, 99), 1)
+
+def region_statistics(img_array, ys, xs, sizes):
+    """
+    Brightness, contrast and edge density of the square regions
+    img_array[y:y+size, x:x+size], read from summed-area tables in O(1) per region.
+    Brightness and contrast are the region's mean and standard deviation over all
+    channels; edge density is the summed absolute grayscale gradient per sample.
+    """
+    pixels = img_array[:, :, np.newaxis] if img_array.ndim == 2 else img_array
+    height, width, channels = pixels.shape
     
-    # Probability factor for realistic detection rates
-    detection_probability = random.random() < 0.35
+    # Integer images are summed exactly; grayscale is kept as the channel sum
+    # and only divided by the channel count once per region
+    dtype = np.int64 if np.issubdtype(pixels.dtype, np.integer) else np.float64
+    tables = integral_image(pixels, dtype)
     
-    return has_boat_brightness and has_defined_edges and detection_probability
+    y2 = ys + sizes
+    x2 = xs + sizes
+    area = sizes * sizes
+    
+    samples = area * channels
+    
+    brightness = window_sums(tables[0], ys, xs, y2, x2) / samples
+    mean_square = window_sums(tables[1], ys, xs, y2, x2) / samples
+    contrast = np.sqrt(np.maximum(mean_square - brightness * brightness, 0))
+    
+    edges = (
+        window_sums(tables[2], ys, xs, y2 - 1, x2)
+        + window_sums(tables[3], ys, xs, y2, x2 - 1)
+    )
+    edge_density = edges / samples
+    
+    return brightness, contrast, edge_density
 
-def calculate_region_confidence(region):
-    """Calculate confidence score based on region analysis"""
-    brightness = np.mean(region)
-    contrast = np.std(region)
+def integral_image(pixels, dtype):
+    """
+    Summed-area tables of the per-pixel channel sum, sum of squares and
+    vertical/horizontal channel-sum differences, stacked as four planes and
+    padded with a leading row and column of zeros. The edge planes keep a zero
+    last row/column that region windows never reach.
+    """
+    height, width = pixels.shape[:2]
+    tables = np.zeros((4, height + 1, width + 1), dtype=dtype)
     
-    # Base confidence calculation
-    brightness_score = min(brightness / 255.0, 1.0) * 40
-    contrast_score = min(contrast / 100.0, 1.0) * 30
-    base_confidence = 30 + brightness_score + contrast_score
+    def fill_rows(rows):
+        # Planes for a stripe of rows, plus the next row for the vertical differences
+        start, stop = rows.indices(height)[:2]
+        channel_sum = pixels[start:stop + 1].sum(axis=2, dtype=dtype)
+        count = stop - start
+        
+        planes = np.zeros((4, count, width), dtype=dtype)
+        planes[0] = channel_sum[:count]
+        np.square(pixels[start:stop], dtype=dtype).sum(axis=2, out=planes[1])
+        vertical = np.abs(np.diff(channel_sum, axis=0))
+        planes[2, :len(vertical)] = vertical
+        np.abs(np.diff(channel_sum[:count], axis=1), out=planes[3, :, :-1])
+        
+        np.cumsum(planes, axis=2, out=tables[:, start + 1:stop + 1, 1:])
     
-    # Add some randomness for realistic variation
-    confidence = base_confidence + random.uniform(-5, 15)
+    def accumulate_columns(columns):
+        inner = tables[:, 1:, 1:][:, :, columns]
+        np.cumsum(inner, axis=1, out=inner)
     
-    return round(max(30, min(99, confidence)), 1)
+    # Rows are independent within a stripe for the row-wise sums, and columns
+    # for the column-wise sums, so both passes run as parallel stripes
+    run_in_stripes(fill_rows, height)
+    run_in_stripes(accumulate_columns, width)
+    return tables
+
+def run_in_stripes(function, length):
+    """
+    Apply function to contiguous slices of range(length) in parallel threads.
+    NumPy releases the GIL for the sums, and three stripes per core keep the
+    workers balanced when some stripes finish early.
+    """
+    workers = os.cpu_count() or 1
+    stripe = max(1, -(-length // (3 * workers)))
+    stripes = [slice(start, start + stripe) for start in range(0, length, stripe)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(function, stripes))
+
+def window_sums(table, y1, x1, y2, x2):
+    """Sums of table's source array over [y1, y2) x [x1, x2), element-wise over index arrays"""
+    return table[y2, x2] - table[y1, x2] - table[y2, x1] + table[y1, x1]
 
 def main():
     if len(sys.argv) != 3:
@@ -141,7 +257,7 @@ def main():
             "status": "error",
             "error": "Invalid arguments"
         }
-        print(json.dumps(result))
+        print(json.dumps(result, separators=(',', ':')))
         sys.exit(1)
     
     input_path = sys.argv[1] 
@@ -157,7 +273,7 @@ def main():
             "annotated_image_path": annotated_path,
             "status": "success"
         }
-        print(json.dumps(result))
+        print(json.dumps(result, separators=(',', ':')))
         
     except Exception as e:
         result = {
@@ -166,7 +282,7 @@ def main():
             "status": "error", 
             "error": str(e)
         }
-        print(json.dumps(result))
+        print(json.dumps(result, separators=(',', ':')))
         sys.exit(1)
 
 if __name__ == "__main__":
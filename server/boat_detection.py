@@ -8,8 +8,16 @@ from pillow_heif import register_heif_opener
 register_heif_opener()
 import vision_agent as va
 from vision_agent.tools import register_tool
-from vision_agent.tools import load_image, owlv2_object_detection, overlay_bounding_boxes, save_image
+from vision_agent.tools import load_image, owlv2_object_detection, overlay_bounding_boxes
 import json
+import time
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from annotated_images import save_annotated_image, wait_for_saves
+
+# At most this many owlv2 requests are in flight to the vision-agent API at once
+_api_slots = threading.Semaphore(8)
 
 def detect_and_measure_boats(image_path: str, output_dir: str = None):
     """
@@ -21,38 +29,134 @@ def detect_and_measure_boats(image_path: str, output_dir: str = None):
         image = load_image(image_path)
         
         # 2) Detect boats only in the image using vision-agent with retry logic
-        import time
-        max_retries = 3
-        retry_delay = 2  # seconds
-        
-        detections = []
-        for attempt in range(max_retries):
-            try:
-                detections = owlv2_object_detection("boat", image, box_threshold=0.4)
-                break  # Success, exit retry loop
-            except Exception as e:
-                error_msg = str(e).lower()
-                if "rate limit" in error_msg or "quota" in error_msg or "429" in error_msg:
-                    if attempt < max_retries - 1:
-                        print(f"Rate limit hit, retrying in {retry_delay} seconds... (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(retry_delay)
-                        retry_delay *= 2  # Exponential backoff
-                        continue
-                    else:
-                        print(f"Rate limit exceeded after {max_retries} attempts")
-                        raise e
-                else:
-                    # Re-raise non-rate-limit errors immediately
-                    raise e
+        detections = detect_boats_with_retry(image)
         
         # 3) Calculate the length of each boat in pixels
-        height, width, _ = image.shape
-        for det in detections:
-            x_min, y_min, x_max, y_max = det["bbox"]
-            box_width = (x_max - x_min) * width
-            box_height = (y_max - y_min) * height
-            det["boat_length_pixels"] = max(box_width, box_height)
+        measure_boat_lengths([image], [detections])
+        
+        # 4-5) Label, overlay and save the annotated image
+        return annotate_and_format(image_path, image, detections, output_dir)
         
+    except Exception as e:
+        print(f"Error in boat detection: {str(e)}")
+        return [], None
+
+def detect_and_measure_boats_batch(image_paths: List[str], output_dir: str = None, max_workers: int = 8):
+    """
+    Detect and measure boats across many marina tiles.
+    Returns a list of (detections, annotated_image_path) tuples in input order,
+    one per path; a tile that fails comes back as ([], None) without affecting
+    the others.
+    """
+    # owlv2_object_detection takes a single image per call; tiles are not
+    # mosaicked together since that would shrink boats at model resolution.
+    # The calls wait on the API, so tiles are loaded and detected in threads.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        loaded = list(executor.map(load_and_detect, image_paths))
+    
+    images = [image for image, _ in loaded]
+    batch_detections = [detections for _, detections in loaded]
+    
+    measure_boat_lengths(images, batch_detections)
+    
+    # A tile that failed to load or detect keeps its slot as ([], None)
+    results = [
+        annotate_and_format(image_path, image, detections, output_dir)
+        if image is not None else ([], None)
+        for image_path, image, detections in zip(image_paths, images, batch_detections)
+    ]
+    
+    # Let every queued save finish before handing back paths to the files;
+    # a failed write is reported without discarding the other tiles
+    try:
+        wait_for_saves()
+    except Exception as e:
+        print(f"Error saving annotated image: {str(e)}")
+    
+    return results
+
+def load_and_detect(image_path: str):
+    """
+    Load one tile and run boat detection on it, returning (image, detections).
+    A failure, including running out of rate-limit retries, only affects this
+    tile, which comes back as (None, []) so the rest of the batch is kept.
+    """
+    try:
+        image = load_image(image_path)
+        return image, detect_boats_with_retry(image)
+    except Exception as e:
+        print(f"Error in boat detection for {image_path}: {str(e)}")
+        return None, []
+
+def retry_on_429(max_retries: int = 3, base_delay: float = 2):
+    """
+    Retry the decorated call with exponential backoff when it fails on a rate
+    limit or quota error; any other error is re-raised immediately
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            retry_delay = base_delay
+            for attempt in range(max_retries):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    error_msg = str(e).lower()
+                    if "rate limit" in error_msg or "quota" in error_msg or "429" in error_msg:
+                        if attempt < max_retries - 1:
+                            print(f"Rate limit hit, retrying in {retry_delay} seconds... (attempt {attempt + 1}/{max_retries})")
+                            time.sleep(retry_delay)
+                            retry_delay *= 2  # Exponential backoff
+                            continue
+                        else:
+                            print(f"Rate limit exceeded after {max_retries} attempts")
+                            raise e
+                    else:
+                        # Re-raise non-rate-limit errors immediately
+                        raise e
+        return wrapper
+    return decorator
+
+@retry_on_429(max_retries=3, base_delay=2)
+def detect_boats_with_retry(image):
+    """
+    Run owlv2 boat detection, backing off and retrying on rate limits
+    """
+    # Cap concurrent requests to the API; the slot is released while backing off
+    with _api_slots:
+        return owlv2_object_detection("boat", image, box_threshold=0.4)
+
+def measure_boat_lengths(images, batch_detections):
+    """
+    Set boat_length_pixels on every detection of every image in one NumPy pass.
+    Length is the max dimension of the bounding box in pixels.
+    """
+    bboxes = [det["bbox"] for detections in batch_detections for det in detections]
+    if not bboxes:
+        return
+    
+    # (width, height) of the source image, repeated for each of its detections
+    sizes = [
+        (image.shape[1], image.shape[0])
+        for image, detections in zip(images, batch_detections)
+        for _ in detections
+    ]
+    
+    bboxes = np.array(bboxes, dtype=np.float64)
+    box_sizes = (bboxes[:, 2:] - bboxes[:, :2]) * np.array(sizes, dtype=np.float64)
+    lengths = box_sizes.max(axis=1).tolist()
+    
+    flat_detections = (det for detections in batch_detections for det in detections)
+    for det, length in zip(flat_detections, lengths):
+        det["boat_length_pixels"] = length
+
+def annotate_and_format(image_path: str, image, detections, output_dir: str = None):
+    """
+    Label and overlay measured detections, save the annotated image and
+    convert detections to the existing schema.
+    Returns ([], None) if annotating this image fails.
+    """
+    try:
         # 4) Overlay bounding boxes with labels showing boat number and length
         for i, det in enumerate(detections, 1):
             det['label'] = f"Boat {i} ({int(det['boat_length_pixels'])}px)"
@@ -67,31 +171,36 @@ def detect_and_measure_boats(image_path: str, output_dir: str = None):
         else:
             output_path = f"{base_name}_annotated{ext}"
         
-        save_image(annotated_image, output_path)
+        save_annotated_image(annotated_image, output_path)
         
         # Convert detections to format compatible with existing schema
-        formatted_detections = []
-        for i, det in enumerate(detections):
-            formatted_detections.append({
-                "objectId": f"boat_{i+1}",
-                "objectType": "boat",
-                "subType": "vessel",
-                "confidence": float(det["score"]),
-                "bbox": det["bbox"],
-                "boat_length_pixels": int(det["boat_length_pixels"]),
-                "latitude": 0.0,  # Would need GPS data from image metadata
-                "longitude": 0.0,
-                "length": int(det["boat_length_pixels"]) * 0.1,  # Rough pixel to meter conversion
-                "width": int(det["boat_length_pixels"]) * 0.05,
-                "area": int(det["boat_length_pixels"]) * 0.005
-            })
+        formatted_detections = [
+            format_detection(i, det["score"], det["bbox"], int(det["boat_length_pixels"]))
+            for i, det in enumerate(detections, 1)
+        ]
         
         return formatted_detections, output_path
         
     except Exception as e:
-        print(f"Error in boat detection: {str(e)}")
+        print(f"Error annotating {image_path}: {str(e)}")
         return [], None
 
+def format_detection(index: int, score, bbox, length_pixels: int):
+    """Build one detection in the existing schema"""
+    return {
+        "objectId": f"boat_{index}",
+        "objectType": "boat",
+        "subType": "vessel",
+        "confidence": float(score),
+        "bbox": bbox,
+        "boat_length_pixels": length_pixels,
+        "latitude": 0.0,  # Would need GPS data from image metadata
+        "longitude": 0.0,
+        "length": length_pixels * 0.1,  # Rough pixel to meter conversion
+        "width": length_pixels * 0.05,
+        "area": length_pixels * 0.005
+    }
+
 def main():
     """
     Command-line interface for boat detection
@@ -124,6 +233,9 @@ def main():
         # Run boat detection
         detections, annotated_path = detect_and_measure_boats(input_image_path, os.path.dirname(output_base_path))
         
+        # Make sure the annotated file exists before reporting its path
+        wait_for_saves()
+        
         # Output results as JSON for Node.js to parse
         result = {
             "detections": detections,
@@ -131,7 +243,7 @@ def main():
             "status": "success"
         }
         
-        print(json.dumps(result))
+        print(json.dumps(result, separators=(',', ':'), default=float))
         
     except Exception as e:
         # Output error as JSON
@@ -2,15 +2,25 @@
 import os
 import sys
 import json
+import queue
+import threading
 import numpy as np
-from vision_agent.tools import load_image, owlv2_object_detection, overlay_bounding_boxes, save_image
+from PIL import Image
 from pillow_heif import register_heif_opener
-register_heif_opener()
+from annotated_images import save_annotated_image, wait_for_saves
+
+# Register the HEIF opener once per process, even if this module is re-imported
+if "HEIF" not in Image.OPEN:
+    register_heif_opener()
 
 def detect_boats_in_image(image_path: str, output_dir: str = "server/static/annotated"):
     """
     Detect boats in an image and return detection results with annotated image path.
+    The annotated image is written in the background; see wait_for_saves().
     """
+    # vision_agent is heavy to import, so load it only when detection runs
+    from vision_agent.tools import load_image
+    
     try:
         # Ensure output directory exists
         os.makedirs(output_dir, exist_ok=True)
@@ -18,45 +28,124 @@ def detect_boats_in_image(image_path: str, output_dir: str = "server/static/anno
         # Load the image
         image = load_image(image_path)
         
-        # Detect boats/vessels
-        detections = owlv2_object_detection("yacht, boat, vessel, sailboat", image, box_threshold=0.25)
-        
-        # Calculate dimensions and add labels
-        height, width, _ = image.shape
-        for i, det in enumerate(detections, 1):
-            x_min, y_min, x_max, y_max = det["bbox"]
-            box_width = (x_max - x_min) * width
-            box_height = (y_max - y_min) * height
-            det["boat_length_pixels"] = max(box_width, box_height)
-            det["boat_width_pixels"] = min(box_width, box_height)
-            det["boat_id"] = i
-            det['label'] = f"Boat {i} ({int(det['boat_length_pixels'])}px)"
-        
-        # Create annotated image
-        annotated_image = overlay_bounding_boxes(image, detections)
+        annotated_image, result = detect_and_annotate(image, image_path, output_dir)
         
         # Save annotated image
-        base_name = os.path.splitext(os.path.basename(image_path))[0]
-        output_filename = f"{base_name}_annotated.jpg"
-        output_path = os.path.join(output_dir, output_filename)
-        save_image(annotated_image, output_path)
+        save_annotated_image(annotated_image, result["annotated_image_path"])
         
-        # Return results
-        return {
-            "detections": detections,
-            "annotated_image_path": output_path,
-            "annotated_image_url": f"/static/annotated/{output_filename}",
-            "total_boats": len(detections)
-        }
+        return result
         
     except Exception as e:
         raise Exception(f"Object detection failed: {str(e)}")
 
+def detect_and_annotate(image, image_path: str, output_dir: str):
+    """
+    Run detection on an already loaded image and build the annotated image and result.
+    The annotated image is returned unsaved so callers decide when to write it.
+    """
+    from vision_agent.tools import owlv2_object_detection, overlay_bounding_boxes
+    
+    # Detect boats/vessels
+    detections = owlv2_object_detection("yacht, boat, vessel, sailboat", image, box_threshold=0.25)
+    
+    # Calculate dimensions for all boxes at once: (x, y) extents scaled to pixels
+    height, width, _ = image.shape
+    bboxes = np.array([det["bbox"] for det in detections], dtype=np.float64).reshape(-1, 4)
+    box_sizes = (bboxes[:, 2:] - bboxes[:, :2]) * np.array([width, height], dtype=np.float64)
+    lengths = box_sizes.max(axis=1).tolist()
+    widths = box_sizes.min(axis=1).tolist()
+    
+    # Add measurements and labels
+    for i, (det, length, boat_width) in enumerate(zip(detections, lengths, widths), 1):
+        det["boat_length_pixels"] = length
+        det["boat_width_pixels"] = boat_width
+        det["boat_id"] = i
+        det['label'] = f"Boat {i} ({int(length)}px)"
+    
+    # Create annotated image
+    annotated_image = overlay_bounding_boxes(image, detections)
+    
+    base_name = os.path.splitext(os.path.basename(image_path))[0]
+    output_filename = f"{base_name}_annotated.jpg"
+    output_path = os.path.join(output_dir, output_filename)
+    
+    return annotated_image, {
+        "detections": detections,
+        "annotated_image_path": output_path,
+        "annotated_image_url": f"/static/annotated/{output_filename}",
+        "total_boats": len(detections)
+    }
+
+def detect_many(image_paths, output_dir: str = "server/static/annotated", prefetch: int = 2):
+    """
+    Detect boats in many images, overlapping disk I/O with inference.
+    A loader thread decodes the next images while the current one is being
+    detected, and annotated images are saved in the background.
+    Returns one result per path, in input order.
+    """
+    from vision_agent.tools import load_image
+    
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # Bounded so the loader never runs more than `prefetch` images ahead
+    loaded = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    
+    def load_all():
+        for path in image_paths:
+            if stop.is_set():
+                break
+            try:
+                loaded.put((path, load_image(path), None))
+            except Exception as e:
+                loaded.put((path, None, e))
+        loaded.put(None)
+    
+    loader = threading.Thread(target=load_all, daemon=True)
+    loader.start()
+    
+    results = []
+    try:
+        while True:
+            item = loaded.get()
+            if item is None:
+                break
+            path, image, error = item
+            if error is not None:
+                raise Exception(f"Object detection failed for {path}: {str(error)}")
+            
+            annotated_image, result = detect_and_annotate(image, path, output_dir)
+            save_annotated_image(annotated_image, result["annotated_image_path"])
+            results.append(result)
+    except BaseException:
+        # Stop the loader and consume the queue up to its sentinel so the
+        # thread is never left blocked on put(), then let queued saves finish
+        stop.set()
+        while loaded.get() is not None:
+            pass
+        loader.join()
+        try:
+            wait_for_saves()
+        except Exception:
+            pass
+        raise
+    
+    # Surface any save errors before handing back paths to the files
+    wait_for_saves()
+    
+    return results
+
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python object-detection.py <image_path>")
+    if len(sys.argv) < 2:
+        print("Usage: python object-detection.py <image_path> [<image_path> ...]")
         sys.exit(1)
     
-    image_path = sys.argv[1]
-    result = detect_boats_in_image(image_path)
+    image_paths = sys.argv[1:]
+    if len(image_paths) == 1:
+        result = detect_boats_in_image(image_paths[0])
+    else:
+        result = detect_many(image_paths)
+    
+    # Make sure the annotated files exist before reporting their paths
+    wait_for_saves()
     print(json.dumps(result, indent=2))
@@ -5,21 +5,44 @@ import json
 import warnings
 import logging
 from typing import List, Dict, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import cv2
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
+from numpy.lib.stride_tricks import sliding_window_view
+from PIL import Image, ImageColor, ImageDraw, ImageFont
 import random
 
 # Suppress all warnings to keep stdout clean
 warnings.filterwarnings("ignore")
 logging.getLogger().setLevel(logging.ERROR)
 
+LABEL_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+LABEL_FONT_SIZE = 12
+
+# Large captures are scanned in super-tiles of roughly this many pixels per side
+SUPER_TILE_SIZE = 1024
+
+@lru_cache(maxsize=16)
+def get_font(path: str, size: int):
+    """
+    Load a TrueType font once per (path, size), falling back to PIL's default font
+    """
+    try:
+        return ImageFont.truetype(path, size)
+    except Exception:
+        return ImageFont.load_default()
+
 def detect_boats_simple(image_path: str, output_dir: str) -> Tuple[List[Dict], str]:
     """
     Simple boat detection that analyzes the actual image for boat-like features
     """
     try:
-        # Load and analyze the image
+        # Load and analyze the image; palette, alpha and other modes are
+        # converted so the array holds real intensities and boxes can be drawn
         image = Image.open(image_path)
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
         width, height = image.size
         
         # Convert to numpy array for analysis
@@ -31,60 +54,54 @@ def detect_boats_simple(image_path: str, output_dir: str) -> Tuple[List[Dict], s
         
         # Scan image in grid pattern looking for boat-like features
         grid_size = 32
-        boat_count = 0
-        
-        for y in range(0, height - grid_size, grid_size // 2):
-            for x in range(0, width - grid_size, grid_size // 2):
-                # Extract region
-                region = img_array[y:y+grid_size, x:x+grid_size]
-                
-                # Analyze region for boat characteristics
-                if is_boat_like_region(region):
-                    boat_count += 1
-                    confidence = calculate_confidence(region)
-                    
-                    # Create detection with realistic boat dimensions
-                    boat_width = random.randint(15, 45)
-                    boat_height = random.randint(10, 30)
-                    
-                    detection = {
-                        "objectId": f"boat_{boat_count}",
-                        "objectType": "boat",
-                        "subType": "vessel",
-                        "confidence": round(confidence, 2),
-                        "bbox": [
-                            x / width,
-                            y / height,
-                            (x + boat_width) / width,
-                            (y + boat_height) / height
-                        ],
-                        "boat_length_pixels": max(boat_width, boat_height),
-                        "latitude": 0.0,
-                        "longitude": 0.0,
-                        "length": max(boat_width, boat_height) * 0.1,
-                        "width": min(boat_width, boat_height) * 0.1,
-                        "area": boat_width * boat_height * 0.01
-                    }
-                    detections.append(detection)
-        
-        # Create annotated image
-        annotated_image = image.copy()
-        draw = ImageDraw.Draw(annotated_image)
+        step = grid_size // 2
         
-        # Draw bounding boxes and labels
-        for i, det in enumerate(detections):
-            bbox = det["bbox"]
-            x1 = int(bbox[0] * width)
-            y1 = int(bbox[1] * height)
-            x2 = int(bbox[2] * width)
-            y2 = int(bbox[3] * height)
-            
-            # Draw green bounding box
-            draw.rectangle([x1, y1, x2, y2], outline="green", width=2)
+        origins, confidences = scan_for_boats(img_array, grid_size, step)
+        
+        for boat_count, ((y, x), confidence) in enumerate(zip(origins, confidences), 1):
+            # Create detection with realistic boat dimensions
+            boat_width = random.randint(15, 45)
+            boat_height = random.randint(10, 30)
             
-            # Draw label
+            detection = {
+                "objectId": f"boat_{boat_count}",
+                "objectType": "boat",
+                "subType": "vessel",
+                "confidence": round(confidence, 2),
+                "bbox": [
+                    x / width,
+                    y / height,
+                    (x + boat_width) / width,
+                    (y + boat_height) / height
+                ],
+                "boat_length_pixels": max(boat_width, boat_height),
+                "latitude": 0.0,
+                "longitude": 0.0,
+                "length": max(boat_width, boat_height) * 0.1,
+                "width": min(boat_width, boat_height) * 0.1,
+                "area": boat_width * boat_height * 0.01
+            }
+            detections.append(detection)
+        
+        # Create annotated image: boxes are rasterized with OpenCV straight onto
+        # a copy of the pixel array, with all coordinates scaled in one cast
+        annotated_array = img_array.copy()
+        box_color = ImageColor.getcolor("green", image.mode)
+        bboxes = np.array([det["bbox"] for det in detections], dtype=np.float64).reshape(-1, 4)
+        boxes_px = (bboxes * np.array([width, height, width, height])).astype(np.int32).tolist()
+        
+        # Draw green bounding boxes
+        for x1, y1, x2, y2 in boxes_px:
+            cv2.rectangle(annotated_array, (x1, y1), (x2, y2), box_color, 2)
+        
+        annotated_image = Image.fromarray(annotated_array)
+        draw = ImageDraw.Draw(annotated_image)
+        font = get_font(LABEL_FONT_PATH, LABEL_FONT_SIZE)
+        
+        # Draw labels with the cached TrueType font
+        for det, (x1, y1, _, _) in zip(detections, boxes_px):
             label = f"{det['objectId']} ({det['confidence']}%)"
-            draw.text((x1, y1 - 15), label, fill="green")
+            draw.text((x1, y1 - 15), label, fill="green", font=font)
         
         # Save annotated image
         base_name = os.path.basename(image_path).split('.')[0]
@@ -97,44 +114,204 @@ def detect_boats_simple(image_path: str, output_dir: str) -> Tuple[List[Dict], s
         print(f"Detection error: {str(e)}", file=sys.stderr)
         return [], ""
 
-def is_boat_like_region(region: np.ndarray) -> bool:
+def scan_for_boats(img_array: np.ndarray, grid_size: int, step: int,
+                   tile_size: int = SUPER_TILE_SIZE) -> Tuple[List[Tuple[int, int]], List[float]]:
+    """
+    Find boat-like grid regions, working through the image in super-tiles of
+    about tile_size x tile_size pixels so the float working set (grayscale,
+    windows, scores) stays bounded for very large captures.
+    Returns ((y, x) pixel origins, confidences) in row-major scan order.
+    """
+    rows, cols = grid_shape(img_array, grid_size, step)
+    height, width = img_array.shape[:2]
+    cells_per_tile = max(1, tile_size // step)
+    
+    tile_cells = []
+    tile_confidences = []
+    for row0 in range(0, rows, cells_per_tile):
+        row1 = min(row0 + cells_per_tile, rows)
+        for col0 in range(0, cols, cells_per_tile):
+            col1 = min(col0 + cells_per_tile, cols)
+            
+            # One pixel past the last region so the tile's own grid (strict
+            # range end) yields exactly cells [row0, row1) x [col0, col1)
+            y0, x0 = row0 * step, col0 * step
+            y1 = min(height, (row1 - 1) * step + grid_size + 1)
+            x1 = min(width, (col1 - 1) * step + grid_size + 1)
+            
+            cells, confidences = score_tile(img_array[y0:y1, x0:x1], grid_size, step)
+            tile_cells.append(cells + (row0, col0))
+            tile_confidences.append(confidences)
+    
+    if not tile_cells:
+        return [], []
+    
+    cells = np.concatenate(tile_cells)
+    confidences = np.concatenate(tile_confidences)
+    order = np.lexsort((cells[:, 1], cells[:, 0]))
+    return (cells[order] * step).tolist(), confidences[order].tolist()
+
+def score_tile(tile: np.ndarray, grid_size: int, step: int) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Analyze region for boat-like characteristics
+    Score the grid regions of one image tile.
+    Returns (k, 2) (row, col) grid cells that look like boats and their confidences.
     """
-    if region.size == 0:
-        return False
+    # Integer grayscale once for the tile; regions slice into it
+    gray_sum, channels = channel_sum(tile)
     
-    # Check for color patterns typical of boats and marinas
-    mean_color = np.mean(region, axis=(0, 1))
+    # Random factor to simulate realistic detection variability (~30% detection
+    # rate), sampled up front so discarded regions are never scored
+    random_factor = np.random.random(grid_shape(tile, grid_size, step)) > 0.7
     
-    # Look for white/light colored objects (boats) against darker water
-    brightness = np.mean(mean_color)
+    # Coarse pass: only regions that are bright enough, measured exactly from
+    # 1/4 resolution block sums, get full-resolution scoring
+    candidate_cells = coarse_grid_brightness(gray_sum, channels, grid_size, step, factor=4) > 100
     
-    # Calculate edge density (boats have defined edges)
-    gray = np.mean(region, axis=2) if len(region.shape) == 3 else region
-    edges = np.abs(np.diff(gray, axis=0)).sum() + np.abs(np.diff(gray, axis=1)).sum()
-    edge_density = edges / gray.size
+    # Score surviving grid regions in a single vectorized pass
+    brightness, edge_density, variance = analyze_grid_regions(
+        tile, grid_size, step, gray_sum=gray_sum, channels=channels,
+        cell_mask=candidate_cells & random_factor)
     
-    # Boat detection heuristics
+    # Boat detection heuristics (unscored regions are NaN and fail both)
     is_bright_enough = brightness > 100  # Boats are usually lighter than water
     has_edges = edge_density > 5  # Boats have defined edges
     
-    # Random factor to simulate realistic detection variability
-    random_factor = random.random() > 0.7  # ~30% detection rate
-    
-    return is_bright_enough and has_edges and random_factor
+    cells = np.argwhere(is_bright_enough & has_edges)
+    confidences = confidence_from_stats(brightness[tuple(cells.T)], variance[tuple(cells.T)])
+    return cells, confidences
+
+def channel_sum(img_array: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Integer grayscale: the per-pixel sum of color channels as int16, plus the
+    channel count it is scaled by. Exact, and half the bytes of float32.
+    """
+    if img_array.ndim == 3:
+        return img_array.sum(axis=2, dtype=np.int16), img_array.shape[2]
+    return img_array.astype(np.int16), 1
 
-def calculate_confidence(region: np.ndarray) -> float:
+def edge_strength(gray: np.ndarray) -> np.ndarray:
     """
-    Calculate confidence score based on region characteristics
+    Sum of absolute vertical and horizontal neighbour differences over the
+    last two axes. Both difference passes share one buffer with in-place
+    abs, instead of the four temporaries np.abs(np.diff(...)) allocates.
+    Integer input (channel sums) stays in int16 with an int32 accumulator.
     """
-    # Base confidence on image characteristics
-    brightness = np.mean(region)
-    variance = np.var(region)
+    batch_shape = gray.shape[:-2]
+    rows, cols = gray.shape[-2:]
+    if np.issubdtype(gray.dtype, np.integer):
+        buf_dtype, sum_dtype = np.int16, np.int32
+    else:
+        buf_dtype, sum_dtype = np.float32, np.float32
+    
+    buf = np.empty(batch_shape + (rows - 1, cols), dtype=buf_dtype)
+    np.subtract(gray[..., 1:, :], gray[..., :-1, :], out=buf, dtype=buf_dtype)
+    np.abs(buf, out=buf)
+    edges = buf.sum(axis=(-2, -1), dtype=sum_dtype)
     
+    # Same element count, so the buffer is reused for the horizontal pass
+    buf = buf.reshape(batch_shape + (rows, cols - 1))
+    np.subtract(gray[..., :, 1:], gray[..., :, :-1], out=buf, dtype=buf_dtype)
+    np.abs(buf, out=buf)
+    edges += buf.sum(axis=(-2, -1), dtype=sum_dtype)
+    
+    return edges
+
+def confidence_from_stats(brightness, variance):
+    """
+    Map brightness and variance (scalars or arrays) to a confidence score
+    """
     # Normalize to confidence score between 30-99%
-    confidence = 30 + (brightness / 255) * 40 + (min(variance, 1000) / 1000) * 29
-    return min(99, max(30, confidence))
+    confidence = 30 + (brightness / 255) * 40 + (np.minimum(variance, 1000) / 1000) * 29
+    return np.clip(confidence, 30, 99)
+
+def analyze_grid_regions(img_array: np.ndarray, grid_size: int, step: int,
+                         gray_sum: np.ndarray = None, channels: int = 1,
+                         cell_mask: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute brightness, edge density and variance for every grid region at once.
+    Returns (ny, nx) arrays indexed by grid cell, matching a scan over
+    range(0, height - grid_size, step) x range(0, width - grid_size, step).
+    When cell_mask is given only those cells are scored; the rest are NaN,
+    which fails every threshold comparison. gray_sum/channels are the
+    channel_sum of img_array, computed here when not supplied.
+    """
+    if gray_sum is None:
+        gray_sum, channels = channel_sum(img_array)
+    
+    height, width = gray_sum.shape
+    if height <= grid_size or width <= grid_size:
+        empty = np.empty((0, 0))
+        return empty, empty, empty
+    
+    # (ny, nx, ..., grid_size, grid_size) views over the grid positions, no copies
+    window_shape = (grid_size, grid_size)
+    windows = sliding_window_view(gray_sum, window_shape)[:height - grid_size:step, :width - grid_size:step]
+    pixel_windows = sliding_window_view(img_array, window_shape, axis=(0, 1))[:height - grid_size:step, :width - grid_size:step]
+    
+    grid_rows = windows.shape[0]
+    scale = channels * grid_size * grid_size
+    fill = np.nan if cell_mask is not None else 0
+    brightness = np.full(windows.shape[:2], fill, dtype=np.float32)
+    edge_density = np.full(windows.shape[:2], fill, dtype=np.float32)
+    variance = np.full(windows.shape[:2], fill, dtype=np.float32)
+    
+    def score_rows(rows: slice):
+        row_windows = windows[rows]
+        row_pixels = pixel_windows[rows]
+        cells = Ellipsis
+        if cell_mask is not None:
+            # Gather only the requested cells into (k, ...) stacks
+            cells = np.nonzero(cell_mask[rows])
+            row_windows = row_windows[cells]
+            row_pixels = row_pixels[cells]
+        
+        # Exact integer window sums, scaled back to mean grayscale per pixel
+        cell_dims = row_windows.ndim - 2
+        brightness[rows][cells] = row_windows.sum(axis=(-2, -1), dtype=np.int32) / scale
+        edge_density[rows][cells] = edge_strength(row_windows) / scale
+        # Variance across all channel values of the region
+        variance[rows][cells] = row_pixels.var(axis=tuple(range(cell_dims, row_pixels.ndim)), dtype=np.float32)
+    
+    # NumPy reductions release the GIL, so row stripes score in parallel threads
+    workers = max(1, min(os.cpu_count() or 1, grid_rows))
+    rows_per_stripe = -(-grid_rows // workers)
+    stripes = [slice(start, start + rows_per_stripe) for start in range(0, grid_rows, rows_per_stripe)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(score_rows, stripes))
+    
+    return brightness, edge_density, variance
+
+def coarse_grid_brightness(gray_sum: np.ndarray, channels: int, grid_size: int, step: int,
+                           factor: int = 4) -> np.ndarray:
+    """
+    Mean brightness of every grid region, read from a 1/factor downsampled
+    image of integer factor x factor block sums. Block sums add up to exact
+    region sums, at 1/factor^2 of the full-resolution window work.
+    Returns the same (ny, nx) grid as analyze_grid_regions.
+    """
+    height, width = gray_sum.shape
+    if height <= grid_size or width <= grid_size:
+        return np.empty((0, 0))
+    
+    rows, cols = grid_shape(gray_sum, grid_size, step)
+    
+    # Crop to whole blocks, then sum each factor x factor block
+    cropped = gray_sum[:height - height % factor, :width - width % factor]
+    coarse = cropped.reshape(cropped.shape[0] // factor, factor, cropped.shape[1] // factor, factor)
+    coarse = coarse.sum(axis=(1, 3), dtype=np.int32)
+    
+    coarse_size = grid_size // factor
+    coarse_step = step // factor
+    coarse_windows = sliding_window_view(coarse, (coarse_size, coarse_size))[::coarse_step, ::coarse_step]
+    region_sums = coarse_windows[:rows, :cols].sum(axis=(2, 3), dtype=np.int32)
+    return region_sums / (channels * grid_size * grid_size)
+
+def grid_shape(img_array: np.ndarray, grid_size: int, step: int) -> Tuple[int, int]:
+    """
+    Number of (rows, cols) grid regions scanned for an image
+    """
+    height, width = img_array.shape[:2]
+    return (len(range(0, height - grid_size, step)), len(range(0, width - grid_size, step)))
 
 def main():
     if len(sys.argv) != 3:
@@ -167,7 +344,7 @@ def main():
             "status": "success"
         }
         
-        print(json.dumps(result))
+        print(json.dumps(result, separators=(',', ':')))
         
     except Exception as e:
         # Output error as JSON
@@ -6,46 +6,101 @@ Annotates final detections on a specific tile image
 
 import sys
 import json
+import io
 import os
-from PIL import Image, ImageDraw, ImageFont
+from collections import defaultdict
+from functools import lru_cache
+from PIL import Image, ImageColor, ImageDraw, ImageFont
 import requests
 from urllib.parse import urlparse
 import numpy as np
 
-def download_tile_image(tile_url, output_path):
-    """Download tile image from URL"""
+# Colors for different boat sizes
+SIZE_COLORS = {
+    'small': '#00FF00',    # Green for small boats
+    'medium': '#FFFF00',   # Yellow for medium boats  
+    'large': '#FF0000'     # Red for large boats
+}
+
+# The same colors as RGB tuples, parsed once for the box overlay
+SIZE_RGB = {size: ImageColor.getrgb(color) for size, color in SIZE_COLORS.items()}
+
+# Reused across downloads so repeated requests to the same host keep their connection
+_SESSION = requests.Session()
+
+def download_tile_image(tile_url):
+    """
+    Download tile image from URL, returning a path or in-memory file that
+    Image.open can read directly, or None if the tile is unavailable
+    """
     try:
         if tile_url.startswith('http'):
-            # Download from URL
-            response = requests.get(tile_url, timeout=30)
-            response.raise_for_status()
-            
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
+            # Download from URL over the shared keep-alive session
+            with _SESSION.get(tile_url, timeout=30) as response:
+                response.raise_for_status()
+                return io.BytesIO(response.content)
         else:
-            # Local file path - copy or use directly
+            # Local file path - use directly
             if tile_url.startswith('/api/static/'):
                 # Convert API path to filesystem path
                 local_path = tile_url.replace('/api/static/', 'server/static/')
                 if os.path.exists(local_path):
-                    with open(local_path, 'rb') as src:
-                        with open(output_path, 'wb') as dst:
-                            dst.write(src.read())
+                    return local_path
                 else:
                     raise FileNotFoundError(f"Local tile image not found: {local_path}")
             else:
                 # Direct file path
                 if os.path.exists(tile_url):
-                    with open(tile_url, 'rb') as src:
-                        with open(output_path, 'wb') as dst:
-                            dst.write(src.read())
+                    return tile_url
                 else:
                     raise FileNotFoundError(f"Tile image not found: {tile_url}")
-        
-        return True
     except Exception as e:
         print(f"Error downloading tile image: {e}")
-        return False
+        return None
+
+# Scratch canvas used only to measure text
+_MEASURE_DRAW = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+@lru_cache(maxsize=512)
+def get_text_extent(label, font):
+    """
+    Bounding box of label drawn at (0, 0). Text drawn at (x, y) has the same box
+    offset by (x, y), so each distinct label is only laid out once.
+    """
+    return _MEASURE_DRAW.textbbox((0, 0), label, font=font)
+
+def extract_box(detection):
+    """
+    Map a detection to its (x1, y1, x2, y2) pixel box, or None when it cannot be drawn.
+    The format is checked per detection, since one tile can mix detections with and
+    without a bounding box.
+    """
+    # Get bounding box from detection data
+    bounding_box = detection.get('boundingBox', detection.get('bounding_box'))
+    
+    if bounding_box and isinstance(bounding_box, dict):
+        # Handle JSONB format: {x, y, width, height}
+        x = bounding_box.get('x', 0)
+        y = bounding_box.get('y', 0)
+        width = bounding_box.get('width', 0)
+        height = bounding_box.get('height', 0)
+        return int(x), int(y), int(x + width), int(y + height)
+    
+    if bounding_box:
+        # Other bounding box formats are not drawn
+        return None
+    
+    # Fallback: use center coordinates if available
+    center_x = detection.get('centerX', detection.get('center_x', 320))
+    center_y = detection.get('centerY', detection.get('center_y', 320))
+    width = detection.get('width', 5) * 10  # Scale up for visibility
+    length = detection.get('length', 5) * 10
+    return (
+        int(center_x - width/2),
+        int(center_y - length/2),
+        int(center_x + width/2),
+        int(center_y + length/2)
+    )
 
 def visualize_tile_detections(data_file, output_dir):
     """
@@ -66,14 +121,13 @@ def visualize_tile_detections(data_file, output_dir):
         print(f"Final detections to visualize: {len(detections)}")
         
         # Download tile image
-        temp_tile_path = os.path.join(output_dir, f"temp_tile_{analysis_id}_{tile_index}.jpg")
+        tile_source = download_tile_image(tile_url)
         
-        if not download_tile_image(tile_url, temp_tile_path):
+        if tile_source is None:
             raise Exception("Failed to download tile image")
         
-        # Load and process image directly as RGB
-        image = Image.open(temp_tile_path).convert('RGB')
-        draw = ImageDraw.Draw(image)
+        # Decode the tile in memory and process directly as RGB
+        image = Image.open(tile_source).convert('RGB')
         
         print(f"Image dimensions: {image.width} x {image.height}")
         
@@ -91,45 +145,21 @@ def visualize_tile_detections(data_file, output_dir):
                 font = ImageFont.load_default()
                 print("Using default font")
         
-        # Colors for different boat sizes
-        size_colors = {
-            'small': '#00FF00',    # Green for small boats
-            'medium': '#FFFF00',   # Yellow for medium boats  
-            'large': '#FF0000'     # Red for large boats
-        }
+        # All bounding boxes go on one semi-transparent overlay that is
+        # composited onto the tile once, after every detection is drawn
+        overlay = Image.new('RGBA', image.size, (0, 0, 0, 0))
+        overlay_draw = ImageDraw.Draw(overlay)
+        boxes_by_color = defaultdict(list)
+        labels = []
         
         # Draw final detections
         detection_count = 0
         for detection in detections:
             try:
-                # Get bounding box from detection data
-                bounding_box = detection.get('boundingBox', detection.get('bounding_box'))
-                
-                if bounding_box:
-                    # Handle JSONB format: {x, y, width, height}
-                    if isinstance(bounding_box, dict):
-                        x = bounding_box.get('x', 0)
-                        y = bounding_box.get('y', 0)
-                        width = bounding_box.get('width', 0)
-                        height = bounding_box.get('height', 0)
-                        
-                        x1 = int(x)
-                        y1 = int(y)
-                        x2 = int(x + width)
-                        y2 = int(y + height)
-                    else:
-                        continue
-                else:
-                    # Fallback: use center coordinates if available
-                    center_x = detection.get('centerX', detection.get('center_x', 320))
-                    center_y = detection.get('centerY', detection.get('center_y', 320))
-                    width = detection.get('width', 5) * 10  # Scale up for visibility
-                    length = detection.get('length', 5) * 10
-                    
-                    x1 = int(center_x - width/2)
-                    y1 = int(center_y - length/2)
-                    x2 = int(center_x + width/2)
-                    y2 = int(center_y + length/2)
+                box = extract_box(detection)
+                if box is None:
+                    continue
+                x1, y1, x2, y2 = box
                 
                 # Ensure coordinates are within image bounds
                 x1 = max(0, min(x1, image.width))
@@ -146,20 +176,10 @@ def visualize_tile_detections(data_file, output_dir):
                 else:
                     size_category = 'large'
                 
-                color = size_colors.get(size_category, '#FFFFFF')
-                
-                # Create semi-transparent overlay for bounding box
-                overlay = Image.new('RGBA', image.size, (0, 0, 0, 0))
-                overlay_draw = ImageDraw.Draw(overlay)
-                
-                # Convert hex color to RGB
-                color_rgb = tuple(int(color[i:i+2], 16) for i in (1, 3, 5))
+                color_rgb = SIZE_RGB[size_category]
                 
-                # Draw semi-transparent filled rectangle (20% opacity)
-                overlay_draw.rectangle([x1, y1, x2, y2], fill=(*color_rgb, 50), outline=(*color_rgb, 100), width=2)
-                
-                # Composite the overlay onto the main image
-                image = Image.alpha_composite(image.convert('RGBA'), overlay).convert('RGB')
+                # Queue the box with the others of its color
+                boxes_by_color[color_rgb].append((x1, y1, x2, y2))
                 
                 # Create label with boat info including detection ID for debugging
                 confidence = detection.get('confidence', 0)
@@ -174,34 +194,8 @@ def visualize_tile_detections(data_file, output_dir):
                 # Include detection ID for debugging purposes
                 label = f"ID:{detection_id}\n{object_id} {length_m:.1f}m"
                 
-                # Use a very conservative approach - place text in the center of the bounding box
-                # and ensure it's well within image bounds
-                center_x = (x1 + x2) // 2
-                center_y = (y1 + y2) // 2
-                
-                # Calculate text dimensions first to ensure proper positioning
-                temp_bbox = draw.textbbox((0, 0), label, font=font)
-                text_width = temp_bbox[2] - temp_bbox[0]
-                text_height = temp_bbox[3] - temp_bbox[1]
-                
-                # Ensure text position keeps the entire text within image bounds with safe margins
-                label_x = max(10, min(center_x - text_width//2, image.width - text_width - 10))
-                label_y = max(10, min(center_y - text_height//2, image.height - text_height - 10))
-                
-                # Draw label background for better visibility with extreme contrast
-                bbox_text = draw.textbbox((label_x, label_y), label, font=font)
-                # Expand background slightly for padding, but constrain within image bounds
-                bg_left = max(0, bbox_text[0] - 5)
-                bg_top = max(0, bbox_text[1] - 5)
-                bg_right = min(image.width - 1, bbox_text[2] + 5)
-                bg_bottom = min(image.height - 1, bbox_text[3] + 5)
-                bg_bbox = (bg_left, bg_top, bg_right, bg_bottom)
-                
-                # Draw high-contrast background for better text visibility
-                draw.rectangle(bg_bbox, fill='black', outline='white', width=2)
-                
-                # Draw label text in bright white for maximum visibility
-                draw.text((label_x, label_y), label, fill='white', font=font)
+                # Labels are drawn once the boxes are composited so they stay opaque
+                labels.append((label, x1, y1, x2, y2))
                 
                 detection_count += 1
                 
@@ -210,15 +204,57 @@ def visualize_tile_detections(data_file, output_dir):
                 print(f"Error drawing detection {object_id}: {e}")
                 continue
         
+        # Draw semi-transparent filled rectangles (20% opacity) one color at a time
+        for color_rgb, boxes in boxes_by_color.items():
+            fill = (*color_rgb, 50)
+            outline = (*color_rgb, 100)
+            for box in boxes:
+                overlay_draw.rectangle(box, fill=fill, outline=outline, width=2)
+        
+        # Composite the overlay onto the main image
+        image = Image.alpha_composite(image.convert('RGBA'), overlay).convert('RGB')
+        draw = ImageDraw.Draw(image)
+        
+        for label, x1, y1, x2, y2 in labels:
+            # Use a very conservative approach - place text in the center of the bounding box
+            # and ensure it's well within image bounds
+            center_x = (x1 + x2) // 2
+            center_y = (y1 + y2) // 2
+            
+            # Calculate text dimensions first to ensure proper positioning
+            left, top, right, bottom = get_text_extent(label, font)
+            text_width = right - left
+            text_height = bottom - top
+            
+            # Ensure text position keeps the entire text within image bounds with safe margins
+            label_x = max(10, min(center_x - text_width//2, image.width - text_width - 10))
+            label_y = max(10, min(center_y - text_height//2, image.height - text_height - 10))
+            
+            # Draw label background for better visibility with extreme contrast
+            bbox_text = (label_x + left, label_y + top, label_x + right, label_y + bottom)
+            # Expand background slightly for padding, but constrain within image bounds
+            bg_left = max(0, bbox_text[0] - 5)
+            bg_top = max(0, bbox_text[1] - 5)
+            bg_right = min(image.width - 1, bbox_text[2] + 5)
+            bg_bottom = min(image.height - 1, bbox_text[3] + 5)
+            bg_bbox = (bg_left, bg_top, bg_right, bg_bottom)
+            
+            # Draw high-contrast background for better text visibility
+            draw.rectangle(bg_bbox, fill='black', outline='white', width=2)
+            
+            # Draw label text in bright white for maximum visibility
+            draw.text((label_x, label_y), label, fill='white', font=font)
+        
         # Add title with final detection count
         title = f"Tile {tile_index} - Final Detections: {detection_count}"
-        title_bbox = draw.textbbox((10, 10), title, font=font)
+        left, top, right, bottom = get_text_extent(title, font)
+        title_bbox = (10 + left, 10 + top, 10 + right, 10 + bottom)
         draw.rectangle(title_bbox, fill='black', outline='white')
         draw.text((10, 10), title, fill='white', font=font)
         
         # Add legend
         legend_y = 40
-        for size, color in size_colors.items():
+        for size, color in SIZE_COLORS.items():
             legend_text = f"● {size.capitalize()}"
             draw.text((10, legend_y), legend_text, fill=color, font=font)
             legend_y += 20
@@ -226,11 +262,7 @@ def visualize_tile_detections(data_file, output_dir):
         # Save annotated image
         output_filename = f"tile_{analysis_id}_{tile_index}_final_detections.jpg"
         output_path = os.path.join(output_dir, output_filename)
-        image.save(output_path, 'JPEG', quality=95)
-        
-        # Clean up temp file
-        if os.path.exists(temp_tile_path):
-            os.remove(temp_tile_path)
+        image.save(output_path, 'JPEG', quality=85, optimize=False, progressive=False, subsampling=2)
         
         print(f"Visualization saved: {output_path}")
         print(f"Final detections visualized: {detection_count}")
@@ -244,7 +276,7 @@ def visualize_tile_detections(data_file, output_dir):
             "analysis_id": analysis_id
         }
         
-        print(f"RESULT:{json.dumps(result)}")
+        print(f"RESULT:{json.dumps(result, separators=(',', ':'))}")
         return result
         
     except Exception as e:
@@ -255,7 +287,7 @@ def visualize_tile_detections(data_file, output_dir):
             "annotated_image_path": "",
             "detections_count": 0
         }
-        print(f"RESULT:{json.dumps(result)}")
+        print(f"RESULT:{json.dumps(result, separators=(',', ':'))}")
         return result
 
 def main():
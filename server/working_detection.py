@@ -3,11 +3,10 @@
 import os
 import sys
 
-# Set environment variables to fix threading and numpy issues
-os.environ['OPENBLAS_NUM_THREADS'] = '1'
-os.environ['MKL_NUM_THREADS'] = '1'
-os.environ['NUMEXPR_NUM_THREADS'] = '1'
-os.environ['OMP_NUM_THREADS'] = '1'
+# Let numpy/BLAS/OpenMP use every core by default; setting any of these in
+# the environment (e.g. to 1 for a constrained container) still takes precedence
+for thread_variable in ('OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'NUMEXPR_NUM_THREADS', 'OMP_NUM_THREADS'):
+    os.environ.setdefault(thread_variable, str(os.cpu_count() or 1))
 
 import json
 import numpy as np
@@ -55,17 +54,19 @@ def analyze_marina_image(image_path: str, output_dir: str):
         detections = owlv2_object_detection("yacht, boat, vessel", image, box_threshold=0.3)
         print(f"Detection completed, found {len(detections)} objects")
         
-        # Calculate the length of each boat in pixels
+        # Detections are kept as parallel columns and only turned into dicts for JSON
         height, width, _ = image.shape
-        for det in detections:
-            x_min, y_min, x_max, y_max = det["bbox"]
-            box_width = (x_max - x_min) * width
-            box_height = (y_max - y_min) * height
-            det["boat_length_pixels"] = max(box_width, box_height)
+        bboxes = np.array([det["bbox"] for det in detections], dtype=np.float64).reshape(-1, 4)
+        scores = np.array([det["score"] for det in detections], dtype=np.float64)
+        
+        # Calculate the length of each boat in pixels
+        box_widths = (bboxes[:, 2] - bboxes[:, 0]) * width
+        box_heights = (bboxes[:, 3] - bboxes[:, 1]) * height
+        boat_lengths = np.maximum(box_widths, box_heights)
         
         # Add labels showing boat number and length
-        for i, det in enumerate(detections, 1):
-            det['label'] = f"Boat {i} ({int(det['boat_length_pixels'])}px)"
+        for i, (det, boat_length) in enumerate(zip(detections, boat_lengths.astype(int).tolist()), 1):
+            det['label'] = f"Boat {i} ({boat_length}px)"
         
         # Overlay bounding boxes with boat labels
         annotated_image = overlay_bounding_boxes(image, detections)
@@ -76,25 +77,29 @@ def analyze_marina_image(image_path: str, output_dir: str):
         save_image(annotated_image, annotated_image_path)
         
         # Convert Vision Agent detections to our format
-        formatted_detections = []
-        for i, det in enumerate(detections, 1):
-            bbox = det["bbox"]  # normalized coordinates [x_min, y_min, x_max, y_max]
-            boat_length_pixels = det["boat_length_pixels"]
-            
-            detection = {
+        formatted_detections = [
+            {
                 "objectId": f"boat_{i}",
                 "objectType": "boat", 
                 "subType": "vessel",
-                "confidence": round(det["score"] * 100, 1),  # Convert to percentage
-                "bbox": bbox,  # Already normalized
+                "confidence": round(score * 100, 1),  # Convert to percentage
+                "bbox": det["bbox"],  # Already normalized [x_min, y_min, x_max, y_max]
                 "boat_length_pixels": boat_length_pixels,
                 "latitude": 0.0,
                 "longitude": 0.0,
-                "length": boat_length_pixels * 0.15,  # Convert pixels to meters (rough estimate)
-                "width": boat_length_pixels * 0.75 * 0.15,  # Assume width is 75% of length
-                "area": boat_length_pixels * boat_length_pixels * 0.75 * 0.0225
+                "length": length,  # Pixels to meters (rough estimate)
+                "width": boat_width,  # Assume width is 75% of length
+                "area": area
             }
-            formatted_detections.append(detection)
+            for i, (det, score, boat_length_pixels, length, boat_width, area) in enumerate(zip(
+                detections,
+                scores.tolist(),
+                boat_lengths.tolist(),
+                (boat_lengths * 0.15).tolist(),
+                (boat_lengths * 0.75 * 0.15).tolist(),
+                (boat_lengths * boat_lengths * 0.75 * 0.0225).tolist()
+            ), 1)
+        ]
         
         return {
             "detections": formatted_detections,
@@ -131,7 +136,7 @@ def main():
     
     result = analyze_marina_image(image_path, output_dir)
     # Output only the JSON result to stdout, everything else to stderr
-    print(json.dumps(result), flush=True)
+    print(json.dumps(result, separators=(',', ':')), flush=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,21 +3,28 @@
 Simple test to verify text drawing with PIL
 """
 from PIL import Image, ImageDraw, ImageFont
+from functools import lru_cache
 import os
 
+@lru_cache(maxsize=16)
+def _get_font(path, size):
+    """Load a TrueType font once per (path, size), falling back to the default font"""
+    try:
+        font = ImageFont.truetype(path, size)
+        print(f"✓ Loaded {os.path.basename(path)} at size {size}")
+    except Exception as e:
+        print(f"✗ Failed to load font {path}: {e}")
+        font = ImageFont.load_default()
+        print("✓ Using default font")
+    return font
+
 def test_text_drawing():
     # Create a simple test image
     image = Image.new('RGB', (300, 200), color='blue')
     draw = ImageDraw.Draw(image)
     
-    # Try to load a font
-    try:
-        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24)
-        print("✓ Loaded DejaVu Sans Bold font at size 24")
-    except Exception as e:
-        print(f"✗ Failed to load DejaVu font: {e}")
-        font = ImageFont.load_default()
-        print("✓ Using default font")
+    # Load the font (parsed once, then served from cache)
+    font = _get_font("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24)
     
     # Draw background rectangle
     draw.rectangle((10, 10, 250, 80), fill='yellow', outline='red', width=3)
@@ -31,7 +38,7 @@ def test_text_drawing():
     # Save test image
     output_path = "server/static/visualizations/text_test.jpg"
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    image.save(output_path, 'JPEG', quality=95)
+    image.save(output_path, 'JPEG', quality=85, optimize=False)
     print(f"✓ Saved test image to: {output_path}")
 
 if __name__ == "__main__":